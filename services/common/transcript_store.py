@@ -0,0 +1,437 @@
+import os
+import sys
+import glob
+import json
+import mmap
+import struct
+import logging
+import contextlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# --- Konfiguracja ---
+JSON_EXTENSION = ".json"
+COMPACT_EXTENSION = ".vlt"
+TRANSCRIPT_FORMAT = os.getenv("TRANSCRIPT_FORMAT", "json").lower()
+TRANSCRIPT_EXTENSION = COMPACT_EXTENSION if TRANSCRIPT_FORMAT == "compact" else JSON_EXTENSION
+
+# --- Format kolumnowy (.vlt) ---
+# Nagłówek: magic, wersja, flagi, liczba segmentów, liczba słów, liczba napisów.
+# Po nim kolejne sekcje (każda wyrównana do 8 bajtów, little-endian), patrz `_layout`:
+#   seg_flags u8[n], seg_start f64[n], seg_end f64[n], seg_text u32[n]
+#   [FLAG_EXTRAS] seg_extra u32[n]           - pozostałe klucze segmentu jako JSON
+#   [FLAG_WORDS]  seg_words u32[n+1], word_flags u8[w], word_start f64[w], word_end f64[w], word_text u32[w]
+#   [FLAG_WORD_EXTRAS] word_extra u32[w]     - pozostałe klucze słów jako JSON
+#   str_offsets u64[k+1], blob utf-8         - tablica napisów (deduplikowana)
+# Wartości, których nie da się zapisać w kolumnie (brak klucza, tekst None, czas nie będący liczbą),
+# trafiają do JSON-a z dodatkowymi kluczami. Jeśli kolejność kluczy rekordu odbiega od domyślnej
+# (start, end, tekst, dodatkowe klucze, words), JSON ten ma postać [kolejność_kluczy, dodatkowe_klucze].
+# Dzięki temu konwersja JSON <-> .vlt jest bezstratna, łącznie z kolejnością kluczy.
+MAGIC = b"VLTR"
+VERSION = 1
+FLAG_WORDS = 0x1
+FLAG_EXTRAS = 0x2
+FLAG_SORTED = 0x4
+FLAG_WORD_EXTRAS = 0x8
+HEADER = struct.Struct("<4sHHIII4x")
+
+# Flagi pojedynczego rekordu (segmentu lub słowa) w kolumnach seg_flags / word_flags
+HAS_START = 0x1
+HAS_END = 0x2
+HAS_TEXT = 0x4
+START_INT = 0x8
+END_INT = 0x10
+HAS_WORDS = 0x20
+
+
+def _pad(size: int) -> int:
+    return (-size) % 8
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _layout(flags: int, n: int, w: int, k: int) -> List[Tuple[str, str, int]]:
+    """Kolejność, typ i długość sekcji pliku .vlt dla danego nagłówka."""
+    layout = [("seg_flags", "B", n), ("seg_start", "d", n), ("seg_end", "d", n), ("seg_text", "I", n)]
+    if flags & FLAG_EXTRAS:
+        layout.append(("seg_extra", "I", n))
+    if flags & FLAG_WORDS:
+        layout += [("seg_words", "I", n + 1), ("word_flags", "B", w), ("word_start", "d", w),
+                   ("word_end", "d", w), ("word_text", "I", w)]
+    if flags & FLAG_WORD_EXTRAS:
+        layout.append(("word_extra", "I", w))
+    layout.append(("str_offsets", "Q", k + 1))
+    return layout
+
+
+def _section_size(typecode: str, count: int) -> int:
+    size = count * array(typecode).itemsize
+    return size + _pad(size)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and float(value) == value
+
+
+def _extras_id(record: Dict[str, Any], record_flags: int, text_key: str, extras: Dict[str, Any],
+               strings: "_StringTable") -> int:
+    """Zapisuje dodatkowe klucze rekordu (i ewentualnie jego kolejność kluczy) w tablicy napisów."""
+    default_order = [key for key, flag in (("start", HAS_START), ("end", HAS_END), (text_key, HAS_TEXT))
+                     if record_flags & flag]
+    default_order += list(extras) + (["words"] if record_flags & HAS_WORDS else [])
+    payload: Any = extras if list(record) == default_order else [list(record), extras]
+    if not payload:
+        return 0
+    return strings.add(json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+
+
+class _StringTable:
+    """Internuje napisy, aby powtarzające się teksty (np. słowa) zapisywać tylko raz."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.chunks: List[bytes] = []
+        self.add("")
+
+    def add(self, text: str) -> int:
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.chunks)
+            self.chunks.append(text.encode("utf-8"))
+        return string_id
+
+    def offsets(self) -> array:
+        offsets = array("Q", [0])
+        for chunk in self.chunks:
+            offsets.append(offsets[-1] + len(chunk))
+        return offsets
+
+
+def _split_record(record: Dict[str, Any], text_key: str, strings: _StringTable):
+    """
+    Rozdziela segment lub słowo na wartości kolumnowe (flagi, start, end, id tekstu) i słownik
+    pozostałych kluczy. Wartości nienadające się do kolumn zostają w tym słowniku.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"Oczekiwano obiektu JSON, otrzymano: {record!r}")
+    extras = dict(record)
+    record_flags, start, end, text_id = 0, 0.0, None, 0
+
+    if _is_number(record.get("start")):
+        start = float(extras.pop("start"))
+        record_flags |= HAS_START | (START_INT if isinstance(record["start"], int) else 0)
+    if _is_number(record.get("end")):
+        end = float(extras.pop("end"))
+        record_flags |= HAS_END | (END_INT if isinstance(record["end"], int) else 0)
+    if isinstance(record.get(text_key), str):
+        text_id = strings.add(extras.pop(text_key))
+        record_flags |= HAS_TEXT
+
+    # Brak końca: w kolumnie zapisujemy start (segment zerowej długości dla indeksu czasu)
+    return record_flags, start, start if end is None else end, text_id, extras
+
+
+def write_compact(path: str, segments: Iterable[Dict[str, Any]]):
+    """
+    Zapisuje segmenty w kolumnowym formacie .vlt. Czasy trafiają do spakowanych tablic float64,
+    teksty do wspólnej tablicy napisów, a opcjonalne znaczniki słów ("words") do osobnych kolumn.
+    """
+    strings = _StringTable()
+    columns = {
+        "seg_flags": array("B"), "seg_start": array("d"), "seg_end": array("d"),
+        "seg_text": array("I"), "seg_extra": array("I"), "seg_words": array("I", [0]),
+        "word_flags": array("B"), "word_start": array("d"), "word_end": array("d"),
+        "word_text": array("I"), "word_extra": array("I"),
+    }
+    flags = 0
+
+    for seg in segments:
+        seg_flags, start, end, text_id, extras = _split_record(seg, "text", strings)
+
+        words = extras.get("words")
+        if isinstance(words, list) and all(isinstance(word, dict) for word in words):
+            del extras["words"]
+            seg_flags |= HAS_WORDS
+            flags |= FLAG_WORDS
+            for word in words:
+                word_flags, w_start, w_end, w_text, word_extras = _split_record(word, "word", strings)
+                columns["word_flags"].append(word_flags)
+                columns["word_start"].append(w_start)
+                columns["word_end"].append(w_end)
+                columns["word_text"].append(w_text)
+                word_extra = _extras_id(word, word_flags, "word", word_extras, strings)
+                columns["word_extra"].append(word_extra)
+                if word_extra:
+                    flags |= FLAG_WORD_EXTRAS
+        columns["seg_words"].append(len(columns["word_start"]))
+
+        columns["seg_flags"].append(seg_flags)
+        columns["seg_start"].append(start)
+        columns["seg_end"].append(end)
+        columns["seg_text"].append(text_id)
+        seg_extra = _extras_id(seg, seg_flags, "text", extras, strings)
+        columns["seg_extra"].append(seg_extra)
+        if seg_extra:
+            flags |= FLAG_EXTRAS
+
+    # FLAG_SORTED: kolumna startów może służyć wprost jako indeks czasu
+    # (każdy segment ma start i są one niemalejące)
+    starts = columns["seg_start"]
+    if all(f & HAS_START for f in columns["seg_flags"]) and all(a <= b for a, b in zip(starts, starts[1:])):
+        flags |= FLAG_SORTED
+    columns["str_offsets"] = strings.offsets()
+
+    n, w, k = len(starts), len(columns["word_start"]), len(strings.chunks)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, n, w, k))
+        for name, _, _ in _layout(flags, n, w, k):
+            data = _to_little_endian(columns[name])
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+        for chunk in strings.chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class CompactTranscript:
+    """
+    Leniwy, mapowany w pamięć widok na plik .vlt. Segmenty są dekodowane dopiero przy dostępie,
+    a kolumny `starts`/`ends` pozwalają na wyszukiwanie po czasie bez wczytywania tekstów.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Plik transkrypcji {path} jest pusty.")
+        self._views: List[memoryview] = []
+        self._sorted: Optional[Tuple[array, List[int]]] = None
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        header = self._mm[:HEADER.size].ljust(HEADER.size, b"\0")
+        magic, version, self.flags, self._n, self._w, k = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Plik {self.path} nie jest transkrypcją w formacie VidLingo (wersja {VERSION}).")
+
+        layout = _layout(self.flags, self._n, self._w, k)
+        expected_size = HEADER.size + sum(_section_size(typecode, count) for _, typecode, count in layout)
+        if len(self._mm) < expected_size:
+            raise ValueError(f"Plik {self.path} jest uszkodzony: {len(self._mm)} bajtów, nagłówek wymaga co najmniej {expected_size}.")
+
+        self._pos = HEADER.size
+        columns = {name: self._section(typecode, count) for name, typecode, count in layout}
+        self._seg_flags = columns["seg_flags"]
+        self.starts = columns["seg_start"]
+        self.ends = columns["seg_end"]
+        self._seg_text = columns["seg_text"]
+        self._seg_extra = columns.get("seg_extra")
+        self._seg_words = columns.get("seg_words")
+        self._word_flags = columns.get("word_flags")
+        self._word_start = columns.get("word_start")
+        self._word_end = columns.get("word_end")
+        self._word_text = columns.get("word_text")
+        self._word_extra = columns.get("word_extra")
+        self._str_offsets = columns["str_offsets"]
+        self._blob = self._raw(self._pos, len(self._mm) - self._pos)
+        if self._str_offsets[k] > len(self._blob):
+            raise ValueError(f"Plik {self.path} jest uszkodzony: tablica napisów wykracza poza plik.")
+
+    def _raw(self, offset: int, size: int) -> memoryview:
+        view = memoryview(self._mm)[offset:offset + size]
+        self._views.append(view)
+        return view
+
+    def _section(self, typecode: str, count: int):
+        size = count * array(typecode).itemsize
+        view = self._raw(self._pos, size)
+        self._pos += size + _pad(size)
+        if sys.byteorder != "little":
+            values = array(typecode, view.tobytes())
+            values.byteswap()
+            return values
+        column = view.cast(typecode)
+        self._views.append(column)
+        return column
+
+    def _string(self, string_id: int) -> str:
+        return bytes(self._blob[self._str_offsets[string_id]:self._str_offsets[string_id + 1]]).decode("utf-8")
+
+    def _record(self, record_flags: int, start: float, end: float, text_key: str, text_id: int, extra_id: int,
+                words: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        if record_flags & HAS_START:
+            record["start"] = int(start) if record_flags & START_INT else start
+        if record_flags & HAS_END:
+            record["end"] = int(end) if record_flags & END_INT else end
+        if record_flags & HAS_TEXT:
+            record[text_key] = self._string(text_id)
+        key_order = None
+        if extra_id:
+            extras = json.loads(self._string(extra_id))
+            if isinstance(extras, list):
+                key_order, extras = extras
+            record.update(extras)
+        if words is not None:
+            record["words"] = words
+        if key_order:
+            record = {key: record[key] for key in key_order}
+        return record
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("Indeks segmentu poza zakresem.")
+        extra_id = self._seg_extra[i] if self._seg_extra is not None else 0
+        words = self.words(i) if self._seg_flags[i] & HAS_WORDS else None
+        return self._record(self._seg_flags[i], self.starts[i], self.ends[i], "text", self._seg_text[i], extra_id, words)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._n):
+            yield self[i]
+
+    def text(self, i: int) -> str:
+        return self._string(self._seg_text[i])
+
+    def words(self, i: int) -> List[Dict[str, Any]]:
+        """Zwraca znaczniki czasu słów segmentu `i` (pusta lista, jeśli plik ich nie zawiera)."""
+        if self._seg_words is None:
+            return []
+        return [
+            self._record(self._word_flags[j], self._word_start[j], self._word_end[j], "word", self._word_text[j],
+                         self._word_extra[j] if self._word_extra is not None else 0)
+            for j in range(self._seg_words[i], self._seg_words[i + 1])
+        ]
+
+    def _sorted_starts(self):
+        if self.flags & FLAG_SORTED:
+            return self.starts, None
+        if self._sorted is None:
+            # Indeks budujemy raz i używamy przy kolejnych zapytaniach.
+            # Segmenty bez liczbowego "start" nie mają pozycji na osi czasu i są w nim pomijane.
+            timed = [j for j in range(self._n) if self._seg_flags[j] & HAS_START]
+            order = sorted(timed, key=self.starts.__getitem__)
+            self._sorted = (array("d", (self.starts[j] for j in order)), order)
+        return self._sorted
+
+    def index_at(self, t: float) -> Optional[int]:
+        """
+        Zwraca indeks segmentu trwającego w chwili `t` (w sekundach) lub None, jeśli to cisza.
+        Segmenty bez liczbowego "start" nie są brane pod uwagę.
+        """
+        starts, order = self._sorted_starts()
+        pos = bisect_right(starts, t) - 1
+        if pos < 0:
+            return None
+        i = pos if order is None else order[pos]
+        return i if t <= self.ends[i] else None
+
+    def indices_between(self, t0: float, t1: float) -> List[int]:
+        """Zwraca indeksy segmentów rozpoczynających się w przedziale [t0, t1)."""
+        starts, order = self._sorted_starts()
+        positions = range(bisect_left(starts, t0), bisect_left(starts, t1))
+        return list(positions) if order is None else [order[p] for p in positions]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_compact(path: str) -> bool:
+    return path.endswith(COMPACT_EXTENSION)
+
+
+def transcript_stem(path: str) -> str:
+    """Zwraca ścieżkę transkrypcji bez rozszerzenia formatu (.json / .vlt)."""
+    for ext in (JSON_EXTENSION, COMPACT_EXTENSION):
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def read_transcript(path: str) -> List[Dict[str, Any]]:
+    """Wczytuje całą transkrypcję (JSON lub .vlt) jako listę słowników."""
+    if is_compact(path):
+        with CompactTranscript(path) as transcript:
+            return list(transcript)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def open_transcript(path: str):
+    """
+    Otwiera transkrypcję jako context manager. Pliki .vlt są mapowane w pamięć i dekodowane leniwie,
+    pliki JSON są wczytywane w całości do listy.
+    """
+    if is_compact(path):
+        return CompactTranscript(path)
+    return contextlib.nullcontext(read_transcript(path))
+
+
+def write_transcript(path: str, segments: Iterable[Dict[str, Any]]):
+    """Zapisuje segmenty w formacie wynikającym z rozszerzenia ścieżki."""
+    if is_compact(path):
+        write_compact(path, segments)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(list(segments), f, indent=4, ensure_ascii=False)
+
+
+def convert_transcript(src_path: str, dst_path: str):
+    """Bezstratnie konwertuje transkrypcję między formatem JSON a .vlt (w obie strony)."""
+    write_transcript(dst_path, read_transcript(src_path))
+
+
+def find_transcripts(directory: str, suffix: str = "") -> List[str]:
+    """
+    Wyszukuje transkrypcje `*{suffix}.json` i `*{suffix}.vlt`. Jeśli dla tego samego pliku istnieją
+    oba formaty, zwraca ten ustawiony w TRANSCRIPT_FORMAT.
+    """
+    found: Dict[str, str] = {}
+    for ext in (JSON_EXTENSION, COMPACT_EXTENSION):
+        for path in sorted(glob.glob(os.path.join(directory, f"*{suffix}{ext}"))):
+            stem = transcript_stem(path)
+            if stem not in found or ext == TRANSCRIPT_EXTENSION:
+                found[stem] = path
+    return list(found.values())
+
+
+def transcript_exists(stem: str) -> bool:
+    return any(os.path.exists(stem + ext) for ext in (JSON_EXTENSION, COMPACT_EXTENSION))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 3:
+        print("Użycie: python transcript_store.py <wejście.json|.vlt> <wyjście.json|.vlt>")
+        sys.exit(1)
+    convert_transcript(sys.argv[1], sys.argv[2])
+    logging.info(f"Skonwertowano {sys.argv[1]} -> {sys.argv[2]}")
@@ -1,11 +1,11 @@
 import os
 import glob
-import json
 import logging
 import re
 from faster_whisper import WhisperModel
 from typing import Iterator, List, Dict, Any
 import torch
+from transcript_store import TRANSCRIPT_EXTENSION, transcript_exists, write_transcript
 
 # --- Konfiguracja ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,11 +14,13 @@ MODEL_SIZE = "base"
 MAX_SEGMENT_DURATION_S = 6.0
 SILENCE_THRESHOLD_S = 0.75
 SUPPORTED_EXTENSIONS = ["*.mp4", "*.mkv", "*.webm", "*.mov", "*.avi", "*.flv"]
+INCLUDE_WORD_TIMESTAMPS = os.getenv("TRANSCRIPT_WORDS", "0") == "1"
 
-def regroup_words_into_segments(segments: Iterator[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def regroup_words_into_segments(segments: Iterator[Dict[str, Any]], include_words: bool = False) -> List[Dict[str, Any]]:
     """
     Przetwarza wyjście z faster-whisper z włączonymi znacznikami czasu na poziomie słów
     i grupuje słowa w nowe, krótsze i bardziej logiczne segmenty.
+    Przy `include_words=True` każdy segment dostaje też listę "words" ze znacznikami słów.
     """
     logging.info("Rozpoczynanie re-segmentacji na podstawie znaczników czasu na poziomie słów...")
     final_segments = []
@@ -35,7 +37,7 @@ def regroup_words_into_segments(segments: Iterator[Dict[str, Any]]) -> List[Dict
         if not current_segment_words:
             current_segment_start_time = word.start
         
-        current_segment_words.append(word.word)
+        current_segment_words.append(word)
         current_segment_end_time = word.end
         
         is_last_word = (i == len(all_words) - 1)
@@ -49,13 +51,18 @@ def regroup_words_into_segments(segments: Iterator[Dict[str, Any]]) -> List[Dict
                 long_silence_after = True
 
         if is_last_word or ends_with_punctuation or duration_exceeded or long_silence_after:
-            text = " ".join([w.strip() for w in current_segment_words])
+            text = " ".join([w.word.strip() for w in current_segment_words])
             if text:
                 new_segment = {
                     "start": round(current_segment_start_time, 3),
                     "end": round(current_segment_end_time, 3),
                     "text": text
                 }
+                if include_words:
+                    new_segment["words"] = [
+                        {"start": round(w.start, 3), "end": round(w.end, 3), "word": w.word}
+                        for w in current_segment_words
+                    ]
                 final_segments.append(new_segment)
             
             current_segment_words = []
@@ -65,7 +72,7 @@ def regroup_words_into_segments(segments: Iterator[Dict[str, Any]]) -> List[Dict
 def transcribe_videos():
     """
     Skanuje folder w poszukiwaniu plików wideo, transkrybuje je z precyzyjną segmentacją
-    i zapisuje wyniki jako pliki JSON.
+    i zapisuje wyniki jako pliki JSON lub .vlt (zależnie od TRANSCRIPT_FORMAT).
     """
     logging.info("Sprawdzam dostępność GPU dla faster-whisper...")
     if torch.cuda.is_available():
@@ -99,9 +106,10 @@ def transcribe_videos():
     for video_path in video_files:
         try:
             base_filename = os.path.splitext(os.path.basename(video_path))[0]
-            json_output_path = os.path.join(DOWNLOADS_DIR, f"{base_filename}.json")
+            output_stem = os.path.join(DOWNLOADS_DIR, base_filename)
+            output_path = output_stem + TRANSCRIPT_EXTENSION
 
-            if os.path.exists(json_output_path):
+            if transcript_exists(output_stem):
                 logging.info(f"Plik transkrypcji dla {os.path.basename(video_path)} już istnieje. Pomijanie.")
                 continue
 
@@ -111,12 +119,11 @@ def transcribe_videos():
             
             logging.info(f"Wykryty język: '{info.language}' (prawdopodobieństwo: {info.language_probability:.2f})")
 
-            precise_segments = regroup_words_into_segments(segments_iterator)
+            precise_segments = regroup_words_into_segments(segments_iterator, include_words=INCLUDE_WORD_TIMESTAMPS)
 
-            with open(json_output_path, 'w', encoding='utf-8') as f:
-                json.dump(precise_segments, f, indent=4, ensure_ascii=False)
+            write_transcript(output_path, precise_segments)
 
-            logging.info(f"Precyzyjna transkrypcja zapisana do: {os.path.basename(json_output_path)}")
+            logging.info(f"Precyzyjna transkrypcja zapisana do: {os.path.basename(output_path)}")
 
         except Exception as e:
             logging.error(f"Nie udało się przetworzyć pliku {video_path}: {e}", exc_info=True)
@@ -1,9 +1,9 @@
 import os
-import glob
 import json
 import logging
 import re
 from google import genai
+from transcript_store import TRANSCRIPT_EXTENSION, find_transcripts, read_transcript, transcript_stem, write_transcript
 
 # --- Konfiguracja ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -90,16 +90,16 @@ def clean_and_extract_json(response_text: str) -> str:
 
 def translate_json_files():
     """
-    Skanuje pliki JSON, wysyła je do Gemini API do tłumaczenia i zapisuje wyniki.
+    Skanuje pliki transkrypcji (JSON lub .vlt), wysyła je do Gemini API do tłumaczenia i zapisuje wyniki.
     """
     if not client:
         logging.error("Klient Gemini nie jest dostępny. Zakończono działanie.")
         return
 
-    files_to_translate = [f for f in glob.glob(os.path.join(DOWNLOADS_DIR, "*.json")) if not f.endswith('_translated.json')] 
+    files_to_translate = [f for f in find_transcripts(DOWNLOADS_DIR) if not transcript_stem(f).endswith('_translated')]
     
     if not files_to_translate:
-        logging.warning(f"Nie znaleziono plików JSON do tłumaczenia w '{DOWNLOADS_DIR}'.")
+        logging.warning(f"Nie znaleziono transkrypcji do tłumaczenia w '{DOWNLOADS_DIR}'.")
         return
 
     logging.info(f"Znaleziono {len(files_to_translate)} plików do przetłumaczenia.")
@@ -107,8 +107,8 @@ def translate_json_files():
     for file_path in files_to_translate:
         try:
             logging.info(f"Przetwarzanie pliku: {os.path.basename(file_path)}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json_content = json.load(f)
+            # Znaczniki słów nie są potrzebne modelowi, a tylko wydłużają prompt
+            json_content = [{k: v for k, v in seg.items() if k != 'words'} for seg in read_transcript(file_path)]
 
             prompt = f"{SYSTEM_INSTRUCTION}\n\nTranslate the following JSON data to {TARGET_LANG}:\n{json.dumps(json_content, ensure_ascii=False)}"
             
@@ -120,10 +120,9 @@ def translate_json_files():
             cleaned_json_str = clean_and_extract_json(response.text)
             translated_data = json.loads(cleaned_json_str)
 
-            output_path = file_path.replace(".json", "_translated.json")
+            output_path = transcript_stem(file_path) + "_translated" + TRANSCRIPT_EXTENSION
 
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(translated_data, f, indent=4, ensure_ascii=False)
+            write_transcript(output_path, translated_data)
 
             logging.info(f"Uniwersalny skrypt dubbingowy zapisano pomyślnie do: {os.path.basename(output_path)}")
 
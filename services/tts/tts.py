@@ -1,12 +1,15 @@
 import os
-import glob
-import json
 import logging
 import asyncio
 import edge_tts
 from pydub import AudioSegment, effects
-import subprocess
 import shutil
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from transcript_store import find_transcripts, open_transcript, transcript_stem
+from voice_catalog import VoiceCatalog, load_voice_catalog
 
 # --- Konfiguracja ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,30 +19,54 @@ TARGET_LANG = os.getenv("TARGET_LANGUAGE", "Polish")
 TARGET_BITRATE = "192k"
 TARGET_SAMPLE_RATE = 44100
 SUPPORTED_EXTENSIONS = [".mp4", ".mkv", ".webm", ".mov", ".avi", ".flv"]
+DEFAULT_VOICE = "en-US-ChristopherNeural"
 
 # LIMIT JEDNOCZESNYCH POŁĄCZEŃ
 MAX_CONCURRENT_REQUESTS = 3
 semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
-async def find_voice_for_language(lang_name: str) -> str:
-    lang_map = {"Polish": "pl", "English": "en", "German": "de", "Spanish": "es", "French": "fr", "Italian": "it"}
-    lang_code = lang_map.get(lang_name, "en")
-    voices = await edge_tts.list_voices()
-    for voice in voices:
-        if voice['Gender'] == 'Male' and voice['Locale'].lower().startswith(lang_code) and 'Neural' in voice['Name']:
-            logging.info(f"Wybrano głos: {voice['ShortName']}")
-            return voice['ShortName']
-    return "en-US-ChristopherNeural"
-
-def get_audio_duration(path):
+# Dekodowanie/resampling/normalizacja klipów w osobnych procesach (domyślnie jeden na rdzeń)
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", os.cpu_count() or 1))
+# Przyspieszanie (ffmpeg atempo) działa poza limitem zapytań TTS, ale nie więcej procesów niż rdzeni
+stretch_semaphore = asyncio.Semaphore(POSTPROCESS_WORKERS)
+# Klipy są przekazywane z procesów jako 16-bitowe PCM mono
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+def create_postprocess_pool(max_workers=POSTPROCESS_WORKERS) -> ProcessPoolExecutor:
+    """
+    Tworzy pulę procesów do post-processingu. Używamy "forkserver" zamiast domyślnego "fork",
+    bo workery startują leniwie, gdy w procesie działają już wątki (asyncio.to_thread) trzymające blokady.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver"))
+
+async def find_voice_for_language(lang_name: str, catalog: Optional[VoiceCatalog] = None) -> str:
+    """Wybiera męski głos Neural dla języka. Bez przekazanego katalogu pobiera listę głosów z edge_tts."""
+    if catalog is None:
+        catalog = VoiceCatalog(await edge_tts.list_voices())
+    voice = catalog.resolve(lang_name)
+    if voice:
+        logging.info(f"Wybrano głos: {voice}")
+        return voice
+    logging.warning(f"Nie znaleziono głosu dla języka '{lang_name}'. Używam domyślnego: {DEFAULT_VOICE}")
+    return DEFAULT_VOICE
+
+async def run_command(cmd, capture=True):
+    """Uruchamia ffmpeg/ffprobe jako podproces asyncio, nie blokując pętli zdarzeń. Zwraca (kod, stdout)."""
+    pipe = asyncio.subprocess.PIPE if capture else None
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=pipe, stderr=pipe)
+    stdout, _ = await proc.communicate()
+    return proc.returncode, (stdout or b"").decode(errors="replace")
+
+async def get_audio_duration(path):
     """Pobiera czas trwania pliku audio w sekundach za pomocą ffprobe."""
     try:
-        res = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path], capture_output=True, text=True)
-        return float(res.stdout.strip())
+        _, stdout = await run_command(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path])
+        return float(stdout.strip())
     except:
         return 0
 
-def apply_atempo(path, speed):
+async def apply_atempo(path, speed):
     """Zmienia prędkość audio bez zmiany tonu (pitch) używając FFmpeg."""
     temp_speed_path = path.replace(".mp3", "_speed.mp3")
     # FFmpeg atempo obsługuje wartości od 0.5 do 2.0. 
@@ -47,17 +74,37 @@ def apply_atempo(path, speed):
     speed = max(0.5, min(1.5, speed))
     
     cmd = ['ffmpeg', '-y', '-i', path, '-filter:a', f'atempo={speed}', '-vn', temp_speed_path]
-    subprocess.run(cmd, capture_output=True)
+    await run_command(cmd)
     
     if os.path.exists(temp_speed_path):
         os.replace(temp_speed_path, path)
 
+def export_silence(path, duration_s):
+    AudioSegment.silent(duration=int((duration_s or 1) * 1000)).export(path, format="mp3")
+
+def postprocess_clip(path) -> Optional[array]:
+    """
+    Uruchamiane w puli procesów: dekoduje mp3, zmienia częstotliwość próbkowania i normalizuje głośność.
+    Zwraca próbki jako zwartą tablicę PCM (16 bit, mono) albo None, jeśli klipu nie da się wczytać.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    try:
+        seg = AudioSegment.from_mp3(path).set_frame_rate(TARGET_SAMPLE_RATE)
+        seg = seg.set_channels(PCM_CHANNELS).set_sample_width(PCM_SAMPLE_WIDTH)
+        seg = effects.normalize(seg)
+        return array('h', seg.raw_data)
+    except Exception as e:
+        logging.error(f"Błąd wczytywania {path}: {e}")
+        return None
+
 async def generate_segment_audio(text: str, voice: str, output_path: str, target_duration=None, retries=5):
     """Generuje audio, a następnie opcjonalnie je przyspiesza, by pasowało do slotu czasowego."""
     if not text.strip() or text.strip() in [".", "..", "..."]:
-        AudioSegment.silent(duration=int((target_duration or 1) * 1000)).export(output_path, format="mp3")
+        await asyncio.to_thread(export_silence, output_path, target_duration)
         return
 
+    saved = False
     async with semaphore:
         for attempt in range(retries):
             try:
@@ -65,97 +112,130 @@ async def generate_segment_audio(text: str, voice: str, output_path: str, target
                 await communicate.save(output_path)
                 
                 if os.path.exists(output_path) and os.path.getsize(output_path) > 100:
-                    # LOGIKA SYNCHRONIZACJI CZASU
-                    if target_duration and target_duration > 0:
-                        current_dur = get_audio_duration(output_path)
-                        # Jeśli audio jest dłuższe niż dostępne miejsce
-                        if current_dur > (target_duration + 0.1):
-                            speed_needed = current_dur / target_duration
-                            logging.info(f"Przyspieszanie ({speed_needed:.2f}x) dla: {text[:20]}...")
-                            apply_atempo(output_path, speed_needed)
-                    return 
+                    saved = True
+                    break
             except Exception as e:
                 logging.error(f"Próba {attempt+1} nieudana dla '{text[:15]}': {e}")
             await asyncio.sleep(1)
 
+    if not saved:
         # Fallback: cisza
-        AudioSegment.silent(duration=int((target_duration or 1) * 1000)).export(output_path, format="mp3")
+        await asyncio.to_thread(export_silence, output_path, target_duration)
+        return
 
-def build_dub_track(generated_files, total_duration_ms):
-    logging.info(f"Składanie ścieżki: {len(generated_files)} segmentów.")
-    final_track = AudioSegment.silent(duration=total_duration_ms, frame_rate=TARGET_SAMPLE_RATE)
-    
-    for i, clip in enumerate(generated_files):
-        if i % 50 == 0: logging.info(f"Montaż: {i}/{len(generated_files)}")
-        path = clip["audio_path"]
-        if os.path.exists(path) and os.path.getsize(path) > 0:
-            try:
-                seg = AudioSegment.from_mp3(path).set_frame_rate(TARGET_SAMPLE_RATE)
-                seg = effects.normalize(seg)
-                final_track = final_track.overlay(seg, position=int(clip["start"] * 1000))
-            except Exception as e:
-                logging.error(f"Błąd wczytywania {path}: {e}")
-    return final_track
+    # LOGIKA SYNCHRONIZACJI CZASU - już po zwolnieniu slotu TTS, aby nie blokować kolejnych zapytań
+    if target_duration and target_duration > 0:
+        async with stretch_semaphore:
+            current_dur = await get_audio_duration(output_path)
+            # Jeśli audio jest dłuższe niż dostępne miejsce
+            if current_dur > (target_duration + 0.1):
+                speed_needed = current_dur / target_duration
+                logging.info(f"Przyspieszanie ({speed_needed:.2f}x) dla: {text[:20]}...")
+                try:
+                    await apply_atempo(output_path, speed_needed)
+                except Exception as e:
+                    logging.error(f"Nie udało się przyspieszyć '{text[:15]}': {e}")
+
+async def process_segment(pool, text: str, voice: str, output_path: str, start, target_duration=None):
+    """
+    Syntezuje segment, a od razu potem przekazuje jego post-processing do puli procesów,
+    dzięki czemu dekodowanie klipów odbywa się równolegle z trwającymi zapytaniami TTS.
+    """
+    await generate_segment_audio(text, voice, output_path, target_duration=target_duration)
+    pcm = await asyncio.get_running_loop().run_in_executor(pool, postprocess_clip, output_path)
+    return {"start": start, "pcm": pcm}
+
+def _pcm_segment(data) -> AudioSegment:
+    return AudioSegment(data=bytes(data), sample_width=PCM_SAMPLE_WIDTH, frame_rate=TARGET_SAMPLE_RATE, channels=PCM_CHANNELS)
+
+def new_dub_track(total_duration_ms) -> bytearray:
+    """Prealokuje ciszę (PCM) na całą ścieżkę lektorską."""
+    frames = int(total_duration_ms * TARGET_SAMPLE_RATE / 1000)
+    return bytearray(frames * PCM_SAMPLE_WIDTH * PCM_CHANNELS)
+
+def mix_clip(track: bytearray, pcm: array, start):
+    """Nakłada klip PCM na ścieżkę od chwili `start` (w sekundach), modyfikując tylko zajęty fragment."""
+    frame_width = PCM_SAMPLE_WIDTH * PCM_CHANNELS
+    offset = int(int(start * 1000) * TARGET_SAMPLE_RATE / 1000) * frame_width
+    if offset >= len(track) or not pcm:
+        return
+    clip = pcm.tobytes()[:len(track) - offset]
+    end = offset + len(clip)
+    track[offset:end] = _pcm_segment(track[offset:end]).overlay(_pcm_segment(clip)).raw_data
+
+def dub_track_to_segment(track: bytearray) -> AudioSegment:
+    return _pcm_segment(track)
 
 async def main():
     if not os.path.exists(TEMP_DIR): os.makedirs(TEMP_DIR, exist_ok=True)
-    json_files = glob.glob(os.path.join(DOWNLOADS_DIR, "*_translated.json"))
+    json_files = find_transcripts(DOWNLOADS_DIR, "_translated")
     
     if not json_files:
-        logging.error("Brak plików *_translated.json")
+        logging.error("Brak plików *_translated.json / *_translated.vlt")
         return
 
-    for json_path in json_files:
-        base_name = os.path.basename(json_path).replace('_translated.json', '')
-        video_path = next((os.path.join(DOWNLOADS_DIR, base_name + ext) 
-                          for ext in SUPPORTED_EXTENSIONS 
-                          if os.path.exists(os.path.join(DOWNLOADS_DIR, base_name + ext))), None)
-        
-        if not video_path:
-            logging.error(f"Nie znaleziono wideo dla {base_name}")
-            continue
-
-        logging.info(f"PRZETWARZANIE: {os.path.basename(video_path)}")
-        with open(json_path, 'r', encoding='utf-8') as f:
-            segments = json.load(f)
-
-        voice = await find_voice_for_language(TARGET_LANG)
-        tasks, metadata = [], []
-
-        for i, seg in enumerate(segments):
-            txt = seg.get('text', '').strip()
-            start = seg.get('start', 0)
-            end = seg.get('end', start + 1)
-            target_dur = end - start
-            
-            out_p = os.path.join(TEMP_DIR, f"seg_{i}.mp3")
-            metadata.append({"audio_path": out_p, "start": start})
-            tasks.append(generate_segment_audio(txt, voice, out_p, target_duration=target_dur))
-
-        # Generowanie wszystkich segmentów
-        await asyncio.gather(*tasks)
-
-        # Pobranie czasu trwania wideo
-        res = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', video_path], capture_output=True, text=True)
-        dur_ms = int(float(res.stdout.strip()) * 1000)
+    # Głos wybierany raz na uruchomienie, z katalogu trzymanego w cache na dysku
+    voice = await find_voice_for_language(TARGET_LANG, await load_voice_catalog())
+
+    with create_postprocess_pool() as pool:
+        for json_path in json_files:
+            base_name = os.path.basename(transcript_stem(json_path))[:-len('_translated')]
+            video_path = next((os.path.join(DOWNLOADS_DIR, base_name + ext) 
+                              for ext in SUPPORTED_EXTENSIONS 
+                              if os.path.exists(os.path.join(DOWNLOADS_DIR, base_name + ext))), None)
         
-        # Miksowanie ścieżki lektorskiej
-        dub_track = build_dub_track(metadata, dur_ms)
-        output_name = base_name + "_SYNC_DUB.mp4"
-        dub_track_tmp = os.path.join(TEMP_DIR, "temp_dub.mp3")
-        dub_track.export(dub_track_tmp, format="mp3", bitrate=TARGET_BITRATE)
+            if not video_path:
+                logging.error(f"Nie znaleziono wideo dla {base_name}")
+                continue
+
+            logging.info(f"PRZETWARZANIE: {os.path.basename(video_path)}")
+
+            # Pobranie czasu trwania wideo
+            dur_ms = int(await get_audio_duration(video_path) * 1000)
+            if dur_ms <= 0:
+                logging.error(f"Nie udało się odczytać długości wideo {os.path.basename(video_path)}")
+                continue
+
+            tasks = []
+
+            with open_transcript(json_path) as segments:
+                for i, seg in enumerate(segments):
+                    txt = seg.get('text', '').strip()
+                    start = seg.get('start', 0)
+                    end = seg.get('end', start + 1)
+                    target_dur = end - start
+                
+                    out_p = os.path.join(TEMP_DIR, f"seg_{i}.mp3")
+                    tasks.append(process_segment(pool, txt, voice, out_p, start, target_duration=target_dur))
+
+            # Generowanie i post-processing segmentów; każdy klip trafia na ścieżkę zaraz po zdekodowaniu,
+            # więc w pamięci trzymamy tylko prealokowaną ścieżkę i klipy, które właśnie są w drodze.
+            track = new_dub_track(dur_ms)
+            logging.info(f"Składanie ścieżki: {len(tasks)} segmentów.")
+            for done, next_clip in enumerate(asyncio.as_completed(tasks)):
+                clip = await next_clip
+                if clip["pcm"]:
+                    mix_clip(track, clip["pcm"], clip["start"])
+                if done % 50 == 0: logging.info(f"Montaż: {done}/{len(tasks)}")
+
+            # Miksowanie ścieżki lektorskiej
+            dub_track = dub_track_to_segment(track)
+            del track
+            output_name = base_name + "_SYNC_DUB.mp4"
+            dub_track_tmp = os.path.join(TEMP_DIR, "temp_dub.mp3")
+            await asyncio.to_thread(dub_track.export, dub_track_tmp, format="mp3", bitrate=TARGET_BITRATE)
         
-        # Finalne połączenie z obrazem
-        final_cmd = [
-            'ffmpeg', '-y', '-i', video_path, '-i', dub_track_tmp,
-            '-filter_complex', "[0:a]volume=0.25[bg];[bg][1:a]amix=inputs=2:duration=first[a_out]",
-            '-map', '0:v:0', '-map', '[a_out]', '-c:v', 'copy', '-c:a', 'aac', '-preset', 'superfast',
-            os.path.join(DOWNLOADS_DIR, output_name)
-        ]
+            # Finalne połączenie z obrazem
+            final_cmd = [
+                'ffmpeg', '-y', '-i', video_path, '-i', dub_track_tmp,
+                '-filter_complex', "[0:a]volume=0.25[bg];[bg][1:a]amix=inputs=2:duration=first[a_out]",
+                '-map', '0:v:0', '-map', '[a_out]', '-c:v', 'copy', '-c:a', 'aac', '-preset', 'superfast',
+                os.path.join(DOWNLOADS_DIR, output_name)
+            ]
         
-        logging.info(f"Renderowanie: {output_name}")
-        subprocess.run(final_cmd)
-        logging.info(f"SUKCES: {output_name}")
+            logging.info(f"Renderowanie: {output_name}")
+            await run_command(final_cmd, capture=False)
+            logging.info(f"SUKCES: {output_name}")
 
     # shutil.rmtree(TEMP_DIR) # Można odkomentować po testach
 
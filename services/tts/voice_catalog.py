@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import logging
+import edge_tts
+from typing import Any, Dict, List, Optional
+
+# --- Konfiguracja ---
+VOICE_CACHE_PATH = os.getenv("VOICE_CACHE_PATH", "/app/temp/voice_catalog.json")
+VOICE_CACHE_TTL_S = float(os.getenv("VOICE_CACHE_TTL_S", 7 * 24 * 3600))
+
+# Nazwa języka (jak w TARGET_LANGUAGE) -> domyślny tag BCP-47 używany przez Edge TTS
+LANGUAGE_LOCALES = {
+    "afrikaans": "af-ZA", "albanian": "sq-AL", "amharic": "am-ET", "arabic": "ar-SA",
+    "azerbaijani": "az-AZ", "bengali": "bn-BD", "bangla": "bn-BD", "bosnian": "bs-BA",
+    "bulgarian": "bg-BG", "burmese": "my-MM", "catalan": "ca-ES", "chinese": "zh-CN",
+    "mandarin": "zh-CN", "cantonese": "zh-HK", "taiwanese": "zh-TW", "croatian": "hr-HR",
+    "czech": "cs-CZ", "danish": "da-DK", "dutch": "nl-NL", "flemish": "nl-BE",
+    "english": "en-US", "american english": "en-US", "british english": "en-GB",
+    "estonian": "et-EE", "filipino": "fil-PH", "tagalog": "fil-PH", "finnish": "fi-FI",
+    "french": "fr-FR", "canadian french": "fr-CA", "galician": "gl-ES", "georgian": "ka-GE",
+    "german": "de-DE", "greek": "el-GR", "gujarati": "gu-IN", "hebrew": "he-IL",
+    "hindi": "hi-IN", "hungarian": "hu-HU", "icelandic": "is-IS", "indonesian": "id-ID",
+    "irish": "ga-IE", "italian": "it-IT", "japanese": "ja-JP", "javanese": "jv-ID",
+    "kannada": "kn-IN", "kazakh": "kk-KZ", "khmer": "km-KH", "korean": "ko-KR",
+    "lao": "lo-LA", "latvian": "lv-LV", "lithuanian": "lt-LT", "macedonian": "mk-MK",
+    "malay": "ms-MY", "malayalam": "ml-IN", "maltese": "mt-MT", "marathi": "mr-IN",
+    "mongolian": "mn-MN", "nepali": "ne-NP", "norwegian": "nb-NO", "norwegian bokmal": "nb-NO",
+    "pashto": "ps-AF", "persian": "fa-IR", "farsi": "fa-IR", "polish": "pl-PL",
+    "portuguese": "pt-PT", "brazilian portuguese": "pt-BR", "romanian": "ro-RO",
+    "russian": "ru-RU", "serbian": "sr-RS", "sinhala": "si-LK", "slovak": "sk-SK",
+    "slovenian": "sl-SI", "somali": "so-SO", "spanish": "es-ES", "mexican spanish": "es-MX",
+    "sundanese": "su-ID", "swahili": "sw-KE", "swedish": "sv-SE", "tamil": "ta-IN",
+    "telugu": "te-IN", "thai": "th-TH", "turkish": "tr-TR", "ukrainian": "uk-UA",
+    "urdu": "ur-PK", "uzbek": "uz-UZ", "vietnamese": "vi-VN", "welsh": "cy-GB",
+    "zulu": "zu-ZA",
+}
+BCP47_PATTERN = re.compile(r"^[a-z]{2,3}(-[a-z0-9]{2,8})*$")
+# Sam kod języka ("en") -> domyślne locale ("en-us")
+DEFAULT_LOCALES: Dict[str, str] = {}
+for _locale in LANGUAGE_LOCALES.values():
+    DEFAULT_LOCALES.setdefault(_locale.split('-')[0], _locale.lower())
+
+
+def language_to_locale(lang: str) -> Optional[str]:
+    """
+    Zamienia nazwę języka ("Polish", "Brazilian Portuguese") lub tag BCP-47 ("pl", "pt-BR", "pt_BR")
+    na znormalizowany (małymi literami) tag BCP-47. Zwraca None dla nieznanych nazw.
+    """
+    key = " ".join(lang.strip().lower().replace("_", "-").split())
+    if key in LANGUAGE_LOCALES:
+        return LANGUAGE_LOCALES[key].lower()
+    if BCP47_PATTERN.match(key):
+        return key
+    return None
+
+
+def _is_neural(voice: Dict[str, Any]) -> bool:
+    return 'Neural' in (voice.get('Name') or voice.get('ShortName', ''))
+
+
+class VoiceCatalog:
+    """Lista głosów Edge TTS zindeksowana po locale, języku, płci i typie (Neural)."""
+
+    def __init__(self, voices: List[Dict[str, Any]]):
+        self.voices = voices
+        self.by_locale: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_language: Dict[str, List[str]] = {}
+        for voice in voices:
+            locale = voice.get('Locale', '').lower()
+            if not locale:
+                continue
+            if locale not in self.by_locale:
+                self.by_locale[locale] = []
+                self.by_language.setdefault(locale.split('-')[0], []).append(locale)
+            self.by_locale[locale].append(voice)
+
+    def find(self, locale: str, gender: Optional[str] = None, neural: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Zwraca głosy dla locale (np. "pl-pl") lub samego języka ("pl"), opcjonalnie filtrując po płci i typie."""
+        locale = locale.lower()
+        locales = [locale] if '-' in locale else self.by_language.get(locale, [])
+        return [
+            voice
+            for loc in locales
+            for voice in self.by_locale.get(loc, [])
+            if (gender is None or voice.get('Gender') == gender) and (neural is None or _is_neural(voice) == neural)
+        ]
+
+    def resolve(self, lang: str, gender: str = "Male") -> Optional[str]:
+        """
+        Wybiera głos dla języka. Preferowany jest głos Neural o zadanej płci, potem dowolny głos Neural,
+        a na końcu jakikolwiek głos w tym języku. Domyślne locale (np. pl-PL) ma pierwszeństwo przed innymi regionami.
+        Jeśli wskazano konkretny region (np. "pt-BR" lub "Brazilian Portuguese"), najpierw sprawdzane są
+        wszystkie głosy tego regionu, niezależnie od płci.
+        """
+        tag = language_to_locale(lang)
+        if tag is None:
+            return None
+        language = tag.split('-')[0]
+        tag = DEFAULT_LOCALES.get(tag, tag)
+        locales = self.by_language.get(language, [])
+        if tag in locales:
+            locales = [tag] + [loc for loc in locales if loc != tag]
+
+        preferences = ((gender, True), (None, True), (None, None))
+        if _requests_region(lang, tag) and tag in locales:
+            candidates = [(tag, pref) for pref in preferences]
+            candidates += [(loc, pref) for pref in preferences for loc in locales[1:]]
+        else:
+            candidates = [(loc, pref) for pref in preferences for loc in locales]
+
+        for locale, (voice_gender, neural) in candidates:
+            matches = self.find(locale, gender=voice_gender, neural=neural)
+            if matches:
+                voice = matches[0]
+                if locale != tag:
+                    logging.warning(f"Brak odpowiedniego głosu dla '{tag}'. Używam głosu z regionu '{voice['Locale']}': {voice['ShortName']}")
+                return voice['ShortName']
+        return None
+
+
+def _requests_region(lang: str, tag: str) -> bool:
+    """Czy TARGET_LANGUAGE wskazuje konkretny region: tag z regionem ("pt-BR") lub nazwa regionalna ("Brazilian Portuguese")."""
+    key = " ".join(lang.strip().lower().replace("_", "-").split())
+    if key in LANGUAGE_LOCALES:
+        return tag != DEFAULT_LOCALES[tag.split('-')[0]]
+    return '-' in key
+
+
+def _read_cache(cache_path: str):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return float(cache['fetched_at']), cache['voices']
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Nie udało się odczytać cache głosów {cache_path}: {e}")
+        return None
+
+
+def _write_cache(cache_path: str, voices: List[Dict[str, Any]]):
+    try:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"fetched_at": time.time(), "voices": voices}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Nie udało się zapisać cache głosów {cache_path}: {e}")
+
+
+async def load_voice_catalog(cache_path: str = VOICE_CACHE_PATH, ttl_s: float = VOICE_CACHE_TTL_S) -> VoiceCatalog:
+    """
+    Zwraca katalog głosów z cache na dysku, jeśli jest młodszy niż `ttl_s`. W przeciwnym razie pobiera listę
+    z edge_tts i odświeża cache. Bez dostępu do sieci używa przeterminowanej kopii z cache.
+    """
+    cached = _read_cache(cache_path)
+    if cached and time.time() - cached[0] < ttl_s:
+        logging.info(f"Katalog głosów wczytany z cache ({len(cached[1])} głosów).")
+        return VoiceCatalog(cached[1])
+
+    try:
+        voices = await edge_tts.list_voices()
+    except Exception as e:
+        if cached:
+            logging.warning(f"Nie udało się pobrać listy głosów ({e}). Używam przeterminowanego cache.")
+            return VoiceCatalog(cached[1])
+        logging.error(f"Nie udało się pobrać listy głosów, a cache jest pusty: {e}")
+        return VoiceCatalog([])
+
+    _write_cache(cache_path, voices)
+    logging.info(f"Pobrano katalog głosów ({len(voices)} głosów) i zapisano do cache.")
+    return VoiceCatalog(voices)
@@ -0,0 +1,141 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# Dodaj katalog services do ścieżki Pythona, aby móc importować moduły
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/common')))
+
+from transcript_store import (CompactTranscript, convert_transcript, find_transcripts, open_transcript,
+                              read_transcript, write_transcript)
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 1.02, 'text': 'Hello world.'},
+    {'start': 1.5, 'end': 2.5, 'text': 'Zażółć gęślą jaźń?', 'speaker': 'A'},
+    {'start': 4.0, 'end': 6.333, 'text': 'Hello world.'},
+]
+
+WORD_SEGMENTS = [
+    {'start': 0.0, 'end': 1.0, 'text': 'Hello world.', 'words': [
+        {'start': 0.0, 'end': 0.5, 'word': ' Hello'},
+        {'start': 0.6, 'end': 1.0, 'word': ' world.'},
+    ]},
+    {'start': 1.5, 'end': 1.8, 'text': 'Hello', 'words': [
+        {'start': 1.5, 'end': 1.8, 'word': ' Hello'},
+    ]},
+]
+
+# Przypadki brzegowe z odpowiedzi modelu: brak kluczy, liczby całkowite, tekst None, dodatkowe klucze słów
+IRREGULAR_SEGMENTS = [
+    {'start': 0, 'end': 2, 'text': 'Int timestamps'},
+    {'start': 2.5, 'text': 'No end'},
+    {'end': 4.0, 'text': None},
+    {'start': 'oops', 'end': 5.0, 'text': 42},
+    {'start': 5.0, 'end': 6.0, 'text': 'Words', 'words': [
+        {'start': 5.0, 'end': 5.5, 'word': ' Words', 'probability': 0.93},
+        {'start': 5, 'word': ' x'},
+    ]},
+    {'start': 6.0, 'end': 7.0, 'text': 'Bad words', 'words': ['not', 'a', 'dict']},
+    {'text': 'Reordered', 'end': 8.0, 'speaker': 'B', 'start': 7.5},
+    {'words': [{'word': ' Hi', 'end': 8.5, 'start': 8.2}], 'start': 8.2, 'end': 8.5, 'text': 'Hi'},
+]
+
+class TestTranscriptStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_json_compact_round_trip_is_lossless(self):
+        # JSON -> .vlt -> JSON musi odtworzyć dokładnie te same dane
+        write_transcript(self.path('video.json'), SEGMENTS)
+        convert_transcript(self.path('video.json'), self.path('video.vlt'))
+        convert_transcript(self.path('video.vlt'), self.path('copy.json'))
+        with open(self.path('copy.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), SEGMENTS)
+
+    def test_irregular_segments_round_trip_is_lossless(self):
+        write_transcript(self.path('irregular.json'), IRREGULAR_SEGMENTS)
+        convert_transcript(self.path('irregular.json'), self.path('irregular.vlt'))
+        result = read_transcript(self.path('irregular.vlt'))
+        self.assertEqual(result, IRREGULAR_SEGMENTS)
+        # Kolejność kluczy również jest zachowana
+        self.assertEqual([list(seg) for seg in result], [list(seg) for seg in IRREGULAR_SEGMENTS])
+        self.assertEqual(list(result[-1]['words'][0]), ['word', 'end', 'start'])
+        with open(self.path('irregular.json'), encoding='utf-8') as f:
+            original_text = f.read()
+        convert_transcript(self.path('irregular.vlt'), self.path('copy.json'))
+        with open(self.path('copy.json'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), original_text)
+        # Typy liczb są zachowane, a segmenty bez słów nie dostają pustej listy "words"
+        self.assertIsInstance(result[0]['start'], int)
+        self.assertNotIn('end', result[1])
+        self.assertNotIn('words', result[0])
+
+    def test_word_timings_round_trip(self):
+        write_transcript(self.path('words.vlt'), WORD_SEGMENTS)
+        self.assertEqual(read_transcript(self.path('words.vlt')), WORD_SEGMENTS)
+        with CompactTranscript(self.path('words.vlt')) as transcript:
+            self.assertEqual([w['word'] for w in transcript.words(0)], [' Hello', ' world.'])
+
+    def test_lazy_access_and_time_index(self):
+        write_transcript(self.path('video.vlt'), SEGMENTS)
+        with open_transcript(self.path('video.vlt')) as transcript:
+            self.assertEqual(len(transcript), 3)
+            self.assertEqual(transcript[-1]['text'], 'Hello world.')
+            self.assertEqual(transcript.text(1), 'Zażółć gęślą jaźń?')
+            self.assertEqual(transcript.index_at(2.0), 1)
+            self.assertIsNone(transcript.index_at(3.0))
+            self.assertIsNone(transcript.index_at(-1.0))
+            self.assertEqual(transcript.indices_between(1.0, 5.0), [1, 2])
+
+    def test_time_index_unsorted_segments(self):
+        write_transcript(self.path('unsorted.vlt'), list(reversed(SEGMENTS)))
+        with CompactTranscript(self.path('unsorted.vlt')) as transcript:
+            self.assertEqual(transcript.index_at(0.5), 2)
+            self.assertEqual(transcript.indices_between(0.0, 2.0), [2, 1])
+            # Indeks po czasie jest budowany raz i używany przy kolejnych zapytaniach
+            index = transcript._sorted_starts()
+            self.assertEqual(transcript.index_at(5.0), 0)
+            self.assertEqual(transcript.index_at(1.5), 1)
+            self.assertIs(transcript._sorted_starts(), index)
+
+    def test_time_index_skips_segments_without_start(self):
+        segments = [{'start': True, 'end': 1.0, 'text': 'bool start'}, {'end': 0.7, 'text': 'no start'}] + SEGMENTS
+        write_transcript(self.path('nostart.vlt'), segments)
+        with CompactTranscript(self.path('nostart.vlt')) as transcript:
+            self.assertEqual(transcript.index_at(0.5), 2)
+            self.assertEqual(transcript.indices_between(0.0, 2.0), [2, 3])
+
+    def test_empty_transcript(self):
+        write_transcript(self.path('empty.vlt'), [])
+        self.assertEqual(read_transcript(self.path('empty.vlt')), [])
+
+    def test_find_transcripts_deduplicates_formats(self):
+        write_transcript(self.path('a.json'), SEGMENTS)
+        write_transcript(self.path('a.vlt'), SEGMENTS)
+        write_transcript(self.path('b_translated.vlt'), SEGMENTS)
+        self.assertEqual(len(find_transcripts(self.tmp.name)), 2)
+        self.assertEqual(find_transcripts(self.tmp.name, '_translated'), [self.path('b_translated.vlt')])
+
+    def test_rejects_foreign_file(self):
+        with open(self.path('bad.vlt'), 'wb') as f:
+            f.write(b'not a transcript at all, definitely')
+        with self.assertRaises(ValueError):
+            CompactTranscript(self.path('bad.vlt'))
+
+    def test_rejects_truncated_file(self):
+        write_transcript(self.path('long.vlt'), SEGMENTS * 100)
+        with open(self.path('long.vlt'), 'rb') as f:
+            data = f.read()
+        with open(self.path('truncated.vlt'), 'wb') as f:
+            f.write(data[:500])
+        with self.assertRaises(ValueError):
+            CompactTranscript(self.path('truncated.vlt'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import os
 
 # Dodaj katalog services do ścieżki Pythona, aby móc importować moduły
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/transcriber')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/common')))
 
 from transcriber import regroup_words_into_segments
 
@@ -93,5 +94,21 @@ class TestTranscriberFunctions(unittest.TestCase):
         self.assertAlmostEqual(result[0]['end'], expected_segments[0]['end'], places=2)
         self.assertEqual(result[0]['text'], expected_segments[0]['text'])
 
+    def test_regroup_words_into_segments_with_word_timestamps(self):
+        # Z include_words=True segment zawiera też znaczniki czasu poszczególnych słów
+        mock_segments_input = [
+            MockSegment([
+                {'word': ' Hello', 'start': 0.0, 'end': 0.5, 'probability': 0.9},
+                {'word': ' world.', 'start': 0.6, 'end': 1.0, 'probability': 0.9},
+            ])
+        ]
+        result = regroup_words_into_segments(mock_segments_input, include_words=True)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['text'], 'Hello world.')
+        self.assertEqual(result[0]['words'], [
+            {'start': 0.0, 'end': 0.5, 'word': ' Hello'},
+            {'start': 0.6, 'end': 1.0, 'word': ' world.'},
+        ])
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,12 +2,18 @@ import unittest
 import sys
 import os
 import asyncio
+import shutil
+import tempfile
 from unittest.mock import AsyncMock, patch
 
 # Dodaj katalog services do ścieżki Pythona, aby móc importować moduły
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/tts')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/common')))
 
-from tts import find_voice_for_language, generate_segment_audio, get_audio_duration, apply_atempo
+import tts
+from array import array
+from tts import (find_voice_for_language, generate_segment_audio, get_audio_duration, apply_atempo, process_segment,
+                 postprocess_clip, create_postprocess_pool, new_dub_track, mix_clip, dub_track_to_segment, TARGET_SAMPLE_RATE)
 
 # Mock dla klasy Communicate z edge_tts
 class MockCommunicate:
@@ -54,7 +60,7 @@ class TestTtsFunctions(unittest.IsolatedAsyncioTestCase):
 
     @patch('tts.os.path.exists', return_value=True)
     @patch('tts.os.path.getsize', return_value=500) # Ensure size > 100 for validation
-    @patch('tts.get_audio_duration', side_effect=[2.0, 1.8]) # Mock for current_dur and after speedup
+    @patch('tts.get_audio_duration', new_callable=AsyncMock, side_effect=[2.0, 1.8]) # Mock for current_dur and after speedup
     @patch('tts.apply_atempo', new_callable=AsyncMock)
     @patch('tts.edge_tts.Communicate', new=MockCommunicate)
     async def test_generate_segment_audio_with_speedup(self, mock_apply_atempo, mock_get_audio_duration, mock_getsize, mock_exists):
@@ -88,7 +94,7 @@ class TestTtsFunctions(unittest.IsolatedAsyncioTestCase):
 
     @patch('tts.os.path.exists', return_value=True)
     @patch('tts.os.path.getsize', side_effect=[50, 500]) # First try fails size check, second succeeds
-    @patch('tts.get_audio_duration', return_value=1.0)
+    @patch('tts.get_audio_duration', new_callable=AsyncMock, return_value=1.0)
     @patch('tts.apply_atempo', new_callable=AsyncMock)
     @patch('tts.edge_tts.Communicate', new=MockCommunicate)
     @patch('tts.asyncio.sleep', new_callable=AsyncMock)
@@ -105,6 +111,96 @@ class TestTtsFunctions(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(os.path.exists(output_path))
         os.remove(output_path) # Clean up dummy file
 
+    @patch('tts.os.path.exists', return_value=True)
+    @patch('tts.os.path.getsize', return_value=500)
+    @patch('tts.get_audio_duration', new_callable=AsyncMock, return_value=3.0)
+    @patch('tts.edge_tts.Communicate', new=MockCommunicate)
+    async def test_semaphore_is_free_during_atempo(self, mock_get_audio_duration, mock_getsize, mock_exists):
+        # Podczas przyspieszania wszystkie sloty zapytań TTS muszą być wolne
+        slots_free = []
+
+        async def fake_apply_atempo(path, speed):
+            for _ in range(tts.MAX_CONCURRENT_REQUESTS):
+                await asyncio.wait_for(tts.semaphore.acquire(), timeout=0.1)
+            for _ in range(tts.MAX_CONCURRENT_REQUESTS):
+                tts.semaphore.release()
+            slots_free.append(True)
+
+        output_path = "temp_audio_free_slot.mp3"
+        with patch('tts.apply_atempo', side_effect=fake_apply_atempo):
+            await generate_segment_audio("Slow text.", "en-US-GuyNeural", output_path, target_duration=1.0)
+
+        self.assertEqual(slots_free, [True])
+        os.remove(output_path)
+
+    @patch('tts.run_command', new_callable=AsyncMock, return_value=(0, "12.5\n"))
+    async def test_get_audio_duration_uses_async_ffprobe(self, mock_run_command):
+        result = await get_audio_duration("video.mp4")
+        self.assertEqual(result, 12.5)
+        self.assertEqual(mock_run_command.call_args.args[0][0], 'ffprobe')
+
+    @patch('tts.run_command', new_callable=AsyncMock, side_effect=FileNotFoundError("ffprobe"))
+    async def test_get_audio_duration_failure_returns_zero(self, mock_run_command):
+        self.assertEqual(await get_audio_duration("missing.mp3"), 0)
+
+    @patch('tts.postprocess_clip', return_value=array('h', [0, 100, -100]))
+    @patch('tts.generate_segment_audio', new_callable=AsyncMock)
+    async def test_process_segment_hands_off_to_pool(self, mock_generate, mock_postprocess):
+        # pool=None uruchamia post-processing w domyślnym executorze pętli
+        result = await process_segment(None, "Hello.", "en-US-GuyNeural", "seg_0.mp3", 1.5, target_duration=2.0)
+
+        mock_generate.assert_awaited_once_with("Hello.", "en-US-GuyNeural", "seg_0.mp3", target_duration=2.0)
+        mock_postprocess.assert_called_once_with("seg_0.mp3")
+        self.assertEqual(result, {"start": 1.5, "pcm": array('h', [0, 100, -100])})
+
+
+class TestDubTrack(unittest.TestCase):
+
+    def test_postprocess_pool_missing_clip_returns_none(self):
+        # Prawdziwa pula procesów bez ffmpeg: sprawdza import modułu w workerze i pickle wyniku
+        with tempfile.TemporaryDirectory() as tmp:
+            empty_path = os.path.join(tmp, 'empty.mp3')
+            open(empty_path, 'wb').close()
+            with create_postprocess_pool(max_workers=1) as pool:
+                results = list(pool.map(postprocess_clip, [os.path.join(tmp, 'missing.mp3'), empty_path]))
+        self.assertEqual(results, [None, None])
+
+    def test_mix_clip_is_truncated_at_track_end(self):
+        track = new_dub_track(1000)
+        mix_clip(track, array('h', [1000] * TARGET_SAMPLE_RATE), 0.5)
+        dub_track = dub_track_to_segment(track)
+        self.assertEqual(len(dub_track), 1000)
+        self.assertEqual(dub_track[:500].max, 0)
+        self.assertEqual(dub_track[500:].max, 1000)
+
+
+@unittest.skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), "Wymaga ffmpeg i ffprobe")
+class TestClipPostProcessing(unittest.TestCase):
+
+    def test_postprocess_clip_in_process_pool_and_mix(self):
+        from pydub.generators import Sine
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tone.mp3')
+            Sine(440).to_audio_segment(duration=500).export(path, format='mp3')
+            # Prawdziwa pula procesów: funkcja i zwracana tablica PCM muszą przejść przez pickle
+            with create_postprocess_pool(max_workers=1) as pool:
+                pcm = pool.submit(postprocess_clip, path).result()
+
+        self.assertIsInstance(pcm, array)
+        self.assertEqual(pcm.typecode, 'h')
+        self.assertAlmostEqual(len(pcm) / TARGET_SAMPLE_RATE, 0.5, delta=0.1)
+
+        track = new_dub_track(2000)
+        mix_clip(track, pcm, 1.0)
+        dub_track = dub_track_to_segment(track)
+        clip_end_ms = 1000 + len(pcm) * 1000 // TARGET_SAMPLE_RATE
+
+        self.assertEqual(len(dub_track), 2000)
+        self.assertEqual(dub_track[:1000].max, 0)
+        self.assertGreater(dub_track[1000:1450].max, 0)
+        self.assertEqual(dub_track[clip_end_ms + 1:].max, 0)
+
 
 if __name__ == '__main__':
     unittest.main()
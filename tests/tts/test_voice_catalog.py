@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+from unittest.mock import AsyncMock, patch
+
+# Dodaj katalog services do ścieżki Pythona, aby móc importować moduły
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../services/tts')))
+
+from voice_catalog import VoiceCatalog, language_to_locale, load_voice_catalog
+
+VOICES = [
+    {'ShortName': 'en-GB-RyanNeural', 'Gender': 'Male', 'Locale': 'en-GB', 'Name': 'en-GB-RyanNeural'},
+    {'ShortName': 'en-US-AriaNeural', 'Gender': 'Female', 'Locale': 'en-US', 'Name': 'en-US-AriaNeural'},
+    {'ShortName': 'en-US-GuyNeural', 'Gender': 'Male', 'Locale': 'en-US', 'Name': 'en-US-GuyNeural'},
+    {'ShortName': 'pt-BR-AntonioNeural', 'Gender': 'Male', 'Locale': 'pt-BR', 'Name': 'pt-BR-AntonioNeural'},
+    {'ShortName': 'uk-UA-PolinaNeural', 'Gender': 'Female', 'Locale': 'uk-UA', 'Name': 'uk-UA-PolinaNeural'},
+]
+
+class TestVoiceCatalog(unittest.TestCase):
+
+    def test_language_to_locale(self):
+        self.assertEqual(language_to_locale('Polish'), 'pl-pl')
+        self.assertEqual(language_to_locale(' brazilian  Portuguese '), 'pt-br')
+        self.assertEqual(language_to_locale('pt_BR'), 'pt-br')
+        self.assertEqual(language_to_locale('uk'), 'uk')
+        self.assertIsNone(language_to_locale('Klingon language'))
+
+    def test_resolve_prefers_default_locale_and_male_neural(self):
+        catalog = VoiceCatalog(VOICES)
+        self.assertEqual(catalog.resolve('English'), 'en-US-GuyNeural')
+        self.assertEqual(catalog.resolve('British English'), 'en-GB-RyanNeural')
+        self.assertEqual(catalog.resolve('en'), 'en-US-GuyNeural')
+
+    def test_resolve_falls_back_to_other_region_and_gender(self):
+        catalog = VoiceCatalog(VOICES)
+        # Brak pt-PT w katalogu: wybierany jest inny region tego samego języka
+        self.assertEqual(catalog.resolve('Portuguese'), 'pt-BR-AntonioNeural')
+        # Brak męskiego głosu: wybierany jest dowolny głos Neural
+        self.assertEqual(catalog.resolve('Ukrainian'), 'uk-UA-PolinaNeural')
+        self.assertIsNone(catalog.resolve('Japanese'))
+
+    def test_explicit_region_is_preferred_over_gender(self):
+        voices = [
+            {'ShortName': 'pt-PT-DuarteNeural', 'Gender': 'Male', 'Locale': 'pt-PT', 'Name': 'pt-PT-DuarteNeural'},
+            {'ShortName': 'pt-BR-FranciscaNeural', 'Gender': 'Female', 'Locale': 'pt-BR', 'Name': 'pt-BR-FranciscaNeural'},
+        ]
+        catalog = VoiceCatalog(voices)
+        self.assertEqual(catalog.resolve('pt-BR'), 'pt-BR-FranciscaNeural')
+        self.assertEqual(catalog.resolve('Brazilian Portuguese'), 'pt-BR-FranciscaNeural')
+        # Bez wskazanego regionu płeć nadal ma pierwszeństwo
+        self.assertEqual(catalog.resolve('pt'), 'pt-PT-DuarteNeural')
+
+    def test_other_region_fallback_is_logged(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(VoiceCatalog(VOICES).resolve('Portuguese'), 'pt-BR-AntonioNeural')
+        self.assertIn('pt-BR', logs.output[0])
+
+    def test_find_by_language_gender_and_neural(self):
+        catalog = VoiceCatalog(VOICES)
+        self.assertEqual(len(catalog.find('en')), 3)
+        self.assertEqual([v['ShortName'] for v in catalog.find('en-US', gender='Female', neural=True)], ['en-US-AriaNeural'])
+
+class TestLoadVoiceCatalog(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_path = os.path.join(self.tmp.name, 'voices.json')
+
+    def write_cache(self, fetched_at):
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': fetched_at, 'voices': VOICES}, f)
+
+    @patch('voice_catalog.edge_tts.list_voices', new_callable=AsyncMock)
+    async def test_fetches_once_then_uses_cache(self, mock_list_voices):
+        mock_list_voices.return_value = VOICES
+        await load_voice_catalog(self.cache_path, ttl_s=3600)
+        catalog = await load_voice_catalog(self.cache_path, ttl_s=3600)
+        mock_list_voices.assert_called_once()
+        self.assertEqual(catalog.resolve('English'), 'en-US-GuyNeural')
+
+    @patch('voice_catalog.edge_tts.list_voices', new_callable=AsyncMock)
+    async def test_expired_cache_is_refreshed(self, mock_list_voices):
+        self.write_cache(time.time() - 7200)
+        mock_list_voices.return_value = VOICES[:1]
+        catalog = await load_voice_catalog(self.cache_path, ttl_s=3600)
+        mock_list_voices.assert_called_once()
+        self.assertEqual(len(catalog.voices), 1)
+
+    @patch('voice_catalog.edge_tts.list_voices', new_callable=AsyncMock, side_effect=OSError("offline"))
+    async def test_offline_uses_expired_cache(self, mock_list_voices):
+        self.write_cache(time.time() - 7200)
+        catalog = await load_voice_catalog(self.cache_path, ttl_s=3600)
+        self.assertEqual(len(catalog.voices), len(VOICES))
+
+    @patch('voice_catalog.edge_tts.list_voices', new_callable=AsyncMock, side_effect=OSError("offline"))
+    async def test_offline_without_cache_returns_empty_catalog(self, mock_list_voices):
+        catalog = await load_voice_catalog(self.cache_path, ttl_s=3600)
+        self.assertIsNone(catalog.resolve('English'))
+
+if __name__ == '__main__':
+    unittest.main()